@@ -0,0 +1,69 @@
+"""Cold-start-to-ready time: full scan versus loading an index snapshot.
+
+Run from the repo root:  python -m benchmarks.cold_start
+"""
+import os
+import sqlite3
+import tempfile
+import time
+
+from tools import indexing, snapshot
+
+DIRS = 250
+FILES_PER_DIR = 200
+
+
+def make_tree(root):
+    for d in range(DIRS):
+        path = os.path.join(root, f"share_{d % 10}", f"album_{d:04d}")
+        os.makedirs(path)
+        for f in range(FILES_PER_DIR):
+            open(os.path.join(path, f"IMG_{f:05d}.jpg"), "w").close()
+
+
+def use_db(path):
+    indexing.DB_PATH = snapshot.DB_PATH = path
+
+
+def count_rows(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        drive = os.path.join(tmp, "drive")
+        make_tree(drive)
+        indexing.DRIVE_PATH = snapshot.DRIVE_PATH = drive
+        indexing.INDEX_LOG_FILE = os.path.join(tmp, "errors.log")
+        snap = os.path.join(tmp, "index.snapshot.gz")
+
+        use_db(os.path.join(tmp, "origin.db"))
+        start = time.perf_counter()
+        indexing.build_file_index()
+        full_scan = time.perf_counter() - start
+        snapshot.export_snapshot(snap)
+
+        use_db(os.path.join(tmp, "new-node.db"))
+        start = time.perf_counter()
+        loaded = snapshot.load_snapshot_if_cold(snap)
+        from_snapshot = time.perf_counter() - start
+
+        start = time.perf_counter()
+        indexing.build_file_index(incremental=True)
+        reconcile = time.perf_counter() - start
+
+        files = count_rows(os.path.join(tmp, "origin.db"))
+        assert loaded and count_rows(os.path.join(tmp, "new-node.db")) == files
+
+        print(f"{files} files, snapshot {os.path.getsize(snap) / 1024:.0f} KiB")
+        print(f"ready after full scan:     {full_scan:.3f}s")
+        print(f"ready after snapshot load: {from_snapshot:.3f}s")
+        print(f"background reconcile:      {reconcile:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
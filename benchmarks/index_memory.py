@@ -0,0 +1,67 @@
+"""Peak memory of build_file_index as the drive grows.
+
+Run from the repo root:  python -m benchmarks.index_memory
+
+Each size is indexed in a fresh subprocess so ru_maxrss is not shared.
+The "path set" column is what the old in-memory seen_paths set would
+have held for the same tree.
+"""
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+
+SIZES = (20_000, 80_000, 200_000)
+FILES_PER_DIR = 200
+
+
+def make_tree(root, count):
+    for d in range(count // FILES_PER_DIR):
+        path = os.path.join(root, f"dir_{d:05d}", "nested")
+        os.makedirs(path)
+        for f in range(FILES_PER_DIR):
+            open(os.path.join(path, f"file_{f:04d}.dat"), "w").close()
+
+
+def index_once(drive, db):
+    from tools import indexing
+
+    indexing.DRIVE_PATH = drive
+    indexing.DB_PATH = db
+    indexing.INDEX_LOG_FILE = db + ".log"
+
+    tracemalloc.start()
+    indexing.build_file_index()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    tracemalloc.start()
+    paths = {os.path.join(root, e.name) for root, _, entries in indexing.walk_drive(drive) for e in entries}
+    _, set_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{len(paths):>8} files  peak RSS {rss:7.1f} MiB  "
+          f"indexer heap {peak / 2**20:6.1f} MiB  path set {set_peak / 2**20:6.1f} MiB")
+
+
+def main():
+    if len(sys.argv) == 3:
+        index_once(sys.argv[1], sys.argv[2])
+        return
+
+    for count in SIZES:
+        with tempfile.TemporaryDirectory() as tmp:
+            drive = os.path.join(tmp, "drive")
+            make_tree(drive, count)
+            result = subprocess.run(
+                [sys.executable, "-m", "benchmarks.index_memory", drive, os.path.join(tmp, "files.db")],
+                check=True, stdout=subprocess.PIPE, text=True,
+            )
+            print(result.stdout.splitlines()[-1])
+
+
+if __name__ == "__main__":
+    main()
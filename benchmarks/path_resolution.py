@@ -0,0 +1,143 @@
+"""Path resolution cost during indexing on a deep tree.
+
+Run from the repo root:  python -m benchmarks.path_resolution
+
+Compares build_file_index with the previous build that ran realpath on
+every file. Stat calls are counted through hooks on os.stat, os.lstat
+(what os.path.realpath issues per path component) and DirEntry.stat
+(what walk_drive issues per directory). Counting and timing are separate
+runs, so the hooks do not skew the times.
+"""
+import os
+import sqlite3
+import tempfile
+import time
+
+from tools import indexing
+
+BRANCHES = 30
+DEPTH = 12
+FILES_PER_DIR = 50
+REPEAT = 3
+
+
+def make_tree(root):
+    for b in range(BRANCHES):
+        path = os.path.join(root, f"branch_{b:02d}")
+        for d in range(DEPTH):
+            path = os.path.join(path, f"level_{d:02d}")
+            os.makedirs(path)
+            for f in range(FILES_PER_DIR):
+                open(os.path.join(path, f"file_{f:03d}.dat"), "w").close()
+
+
+class _CountingEntry:
+    """DirEntry proxy that counts stat() calls"""
+
+    def __init__(self, entry, hook):
+        self._entry = entry
+        self._hook = hook
+
+    def __getattr__(self, name):
+        return getattr(self._entry, name)
+
+    def stat(self, *, follow_symlinks=True):
+        self._hook.calls += 1
+        return self._entry.stat(follow_symlinks=follow_symlinks)
+
+
+class _CountingScandir:
+    def __init__(self, it, hook):
+        self._it = it
+        self._hook = hook
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._it.close()
+
+    def __iter__(self):
+        return (_CountingEntry(entry, self._hook) for entry in self._it)
+
+
+class CountingStat:
+    """Counting hooks installed in place of os.stat, os.lstat and os.scandir.
+
+    DirEntry.is_dir()/is_symlink() are not counted; they only stat on
+    filesystems that do not report d_type.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self._stat, self._lstat, self._scandir = os.stat, os.lstat, os.scandir
+
+    def _counted(self, func):
+        def wrapper(*args, **kwargs):
+            self.calls += 1
+            return func(*args, **kwargs)
+        return wrapper
+
+    def __enter__(self):
+        os.stat = self._counted(self._stat)
+        os.lstat = self._counted(self._lstat)
+        os.scandir = lambda *args: _CountingScandir(self._scandir(*args), self)
+        return self
+
+    def __exit__(self, *exc):
+        os.stat, os.lstat, os.scandir = self._stat, self._lstat, self._scandir
+
+
+def legacy_build_file_index():
+    """Previous build_file_index: realpath on every file"""
+    indexing.init_db()
+    indexing.clear_index()
+    conn = sqlite3.connect(indexing.DB_PATH)
+    batch = []
+    for _, _, entries in indexing.walk_drive(os.path.abspath(indexing.DRIVE_PATH)):
+        for entry in entries:
+            batch.append((entry.name.lower(), indexing.normalize_path(entry.path)))
+            if len(batch) >= 500:
+                conn.executemany("INSERT OR IGNORE INTO files (name, path) VALUES (?, ?)", batch)
+                conn.commit()
+                batch.clear()
+    if batch:
+        conn.executemany("INSERT OR IGNORE INTO files (name, path) VALUES (?, ?)", batch)
+        conn.commit()
+    indexing.bump_index_generation(conn)
+    conn.close()
+
+
+def best_time(build):
+    timings = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        build()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        drive = os.path.join(tmp, "drive")
+        make_tree(drive)
+        indexing.DRIVE_PATH = drive
+        indexing.INDEX_LOG_FILE = os.path.join(tmp, "errors.log")
+        files = BRANCHES * DEPTH * FILES_PER_DIR
+        dirs = BRANCHES * (DEPTH + 1) + 1
+
+        results = []
+        for label, build in (("realpath per file", legacy_build_file_index),
+                             ("build_file_index", indexing.build_file_index)):
+            indexing.DB_PATH = os.path.join(tmp, f"{build.__name__}.db")
+            with CountingStat() as hook:
+                build()
+            results.append((label, hook.calls, best_time(build)))
+
+    print(f"{files} files in {dirs} directories, depth {DEPTH}")
+    for label, calls, elapsed in results:
+        print(f"{label:<18} {calls:>8} stat calls  {elapsed:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Search latency and round-trips: two LIKE queries + 300 versus the catalog view.
+
+Run from the repo root:  python -m benchmarks.search_latency
+
+Only the database and grouping work is timed; the per-result os.stat
+calls are the same for both and are left out.
+"""
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from tools import indexing
+from utils import db_utils
+
+FILES = 300_000
+UPLOADS = 2_000
+QUERIES = ("report", "img_00", "zzz-no-match", "notes_0099", "photo_12")
+REPEAT = 20
+
+
+def populate(db):
+    indexing.DB_PATH = db_utils.DB_PATH = db
+    indexing.init_db()
+    db_utils.init_uploaded_db()
+    conn = sqlite3.connect(db)
+    # Every name occurs in several folders, as on a real media drive
+    kinds = ("img", "report", "notes", "photo")
+    conn.executemany(
+        "INSERT INTO files (name, path) VALUES (?, ?)",
+        ((f"{kinds[i // 1000 % 4]}_{i % 1000:05d}.dat", f"/media/folder_{i // 5000}/{i}.dat")
+         for i in range(FILES)),
+    )
+    conn.executemany(
+        "INSERT INTO uploaded_files (original_name, saved_name, size, path) VALUES (?, ?, 0, ?)",
+        ((f"Report_{i:05d}.dat", f"report_{i:05d}_x.dat", f"/media/uploads/report_{i:05d}_x.dat")
+         for i in range(UPLOADS)),
+    )
+    conn.commit()
+    conn.close()
+
+
+def search_two_queries(conn, query, limit=100):
+    """Previous /search: two LIKE queries, merged in Python, 300 on any collision"""
+    pattern = f"%{query.lower()}%"
+    indexed = conn.execute("SELECT name, path FROM files WHERE LOWER(name) LIKE ? LIMIT ?", (pattern, limit)).fetchall()
+    uploaded = conn.execute(
+        "SELECT original_name, path FROM uploaded_files WHERE LOWER(original_name) LIKE ? LIMIT ?", (pattern, limit)
+    ).fetchall()
+    results_map = {}
+    for name, path in indexed + uploaded:
+        results_map.setdefault(name.lower(), []).append(path)
+    groups = [paths for paths in results_map.values() if len(paths) > 1]
+    # Any collision turns the answer into a 300 without results
+    return 2, bool(groups), len(groups)
+
+
+def search_catalog(conn, query, limit=100):
+    """Current /search: one query on the catalog view, collisions grouped"""
+    pattern = f"%{query.lower()}%"
+    rows = conn.execute(
+        "SELECT name, display_name, path, source FROM catalog WHERE name LIKE ? LIMIT ?", (pattern, limit)
+    ).fetchall()
+    results_map = {}
+    for name, _, path, _ in rows:
+        results_map.setdefault(name, []).append(path)
+    groups = [paths for paths in results_map.values() if len(paths) > 1]
+    # Collisions are grouped in the same response
+    return 1, False, len(groups)
+
+
+def measure(conn, search):
+    timings, queries, extra_round_trips = [], 0, 0
+    for _ in range(REPEAT):
+        for q in QUERIES:
+            start = time.perf_counter()
+            n, collided, _ = search(conn, q)
+            timings.append(time.perf_counter() - start)
+            queries += n
+            # A 300 carries no results, so the client has to ask again
+            extra_round_trips += collided
+    searches = REPEAT * len(QUERIES)
+    return statistics.median(timings), max(timings), queries / searches, extra_round_trips / searches
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, "files.db")
+        populate(db)
+        conn = sqlite3.connect(db)
+        for label, search in (("two queries + 300", search_two_queries), ("catalog view", search_catalog)):
+            median, worst, per_search, extra = measure(conn, search)
+            print(f"{label:<18} median {median * 1000:6.2f} ms  max {worst * 1000:6.2f} ms  "
+                  f"{per_search:.0f} queries/search  {extra:.2f} extra round-trips/search")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Measure /search requests per second against a running server.
+
+Start the server first, e.g.  python launcher.py --workers 4
+then run from the repo root:  python -m benchmarks.search_throughput --clients 16
+
+Compare the result for --workers 1, 2, 4, ... to check scaling with cores.
+"""
+import argparse
+import multiprocessing
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+
+def client(url, duration, results):
+    done = 0
+    errors = 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=10) as resp:
+                resp.read()
+            done += 1
+        except urllib.error.HTTPError as e:
+            e.read()
+            done += 1  # 300 choices is still a served search
+        except Exception:
+            errors += 1
+    results.put((done, errors))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--query", default="jpg")
+    parser.add_argument("--clients", type=int, default=multiprocessing.cpu_count() * 2)
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    url = f"{args.url}/search?{urllib.parse.urlencode({'q': args.query})}"
+    results = multiprocessing.Queue()
+    procs = [
+        multiprocessing.Process(target=client, args=(url, args.duration, results))
+        for _ in range(args.clients)
+    ]
+    for p in procs:
+        p.start()
+    totals = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+
+    done = sum(t[0] for t in totals)
+    errors = sum(t[1] for t in totals)
+    print(f"{done} searches in {args.duration:.0f}s = {done / args.duration:.0f} req/s ({errors} errors)")
+
+
+if __name__ == "__main__":
+    main()
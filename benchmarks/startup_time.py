@@ -0,0 +1,95 @@
+"""Time from launch to /health/live and /health/ready.
+
+Run from the repo root:  python -m benchmarks.startup_time
+
+Starts launcher.py against a generated drive twice: once with no index
+(full scan before ready) and once restarting on the index the first run
+left behind (served at once, warmed and reconciled in the background).
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PORT = 8181
+DIRS = 400
+FILES_PER_DIR = 250
+
+CONFIG = """
+from importlib.machinery import SourceFileLoader
+_repo = SourceFileLoader("_repo_config", {config!r}).load_module()
+globals().update({{k: v for k, v in vars(_repo).items() if k.isupper()}})
+DRIVE_PATH = {drive!r}
+DB_PATH = {db!r}
+INDEX_LOG_FILE = {log!r}
+UPLOAD_FOLDER = {uploads!r}
+INDEX_SNAPSHOT_PATH = ""
+INDEX_POLL_INTERVAL = 0.05
+"""
+
+LAUNCH = """
+import runpy, sys
+sys.path[:0] = [{tmp!r}, {repo!r}]
+sys.argv = ["launcher.py", "--workers", "1", "--port", "{port}"]
+runpy.run_path({launcher!r}, run_name="__main__")
+"""
+
+
+def make_tree(root):
+    for d in range(DIRS):
+        path = os.path.join(root, f"dir_{d:04d}")
+        os.makedirs(path)
+        for f in range(FILES_PER_DIR):
+            open(os.path.join(path, f"doc_{f:04d}.pdf"), "w").close()
+
+
+def status(path):
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{PORT}{path}", timeout=1) as resp:
+            return resp.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return None
+
+
+def time_startup(tmp):
+    script = LAUNCH.format(tmp=tmp, repo=REPO, port=PORT, launcher=os.path.join(REPO, "launcher.py"))
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-c", script], cwd=tmp,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    live = ready = None
+    try:
+        while ready is None and time.perf_counter() - start < 120:
+            if live is None and status("/health/live") == 200:
+                live = time.perf_counter() - start
+            if live is not None and status("/health/ready") == 200:
+                ready = time.perf_counter() - start
+            time.sleep(0.01)
+    finally:
+        proc.terminate()
+        proc.wait()
+    return live, ready
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        drive = os.path.join(tmp, "drive")
+        make_tree(drive)
+        with open(os.path.join(tmp, "config.py"), "w") as f:
+            f.write(CONFIG.format(
+                config=os.path.join(REPO, "config.py"), drive=drive, db=os.path.join(tmp, "files.db"),
+                log=os.path.join(tmp, "errors.log"), uploads=os.path.join(drive, "uploads"),
+            ))
+
+        for label in ("no index (full scan)", "existing index"):
+            live, ready = time_startup(tmp)
+            print(f"{label:<22} live {live:.3f}s  ready {ready:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
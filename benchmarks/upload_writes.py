@@ -0,0 +1,67 @@
+"""Compare per-row commits against the grouped upload metadata writer.
+
+Run from the repo root:  python -m benchmarks.upload_writes
+"""
+from datetime import datetime
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from utils import db_utils
+
+CLIENTS = 8
+FILES_PER_UPLOAD = 25
+
+
+def insert_per_row(original_name, saved_name, size, path):
+    """Previous behaviour: one connection and one commit per file"""
+    conn = sqlite3.connect(db_utils.DB_PATH, timeout=30)
+    cur = conn.cursor()
+    cur.execute("""
+        INSERT INTO uploaded_files (original_name, saved_name, size, path, upload_time)
+        VALUES (?, ?, ?, ?, ?)
+    """, (original_name, saved_name, size, path, datetime.now()))
+    conn.commit()
+    conn.close()
+
+
+def upload_per_row(client):
+    for i in range(FILES_PER_UPLOAD):
+        name = f"c{client}_f{i}.bin"
+        insert_per_row(name, name, 1024, f"/tmp/{name}")
+
+
+def upload_grouped(client):
+    pending = []
+    for i in range(FILES_PER_UPLOAD):
+        name = f"c{client}_f{i}.bin"
+        pending.append(db_utils.insert_uploaded_file(name, name, 1024, f"/tmp/{name}"))
+    for p in pending:
+        p.wait()
+
+
+def run(label, upload):
+    threads = [threading.Thread(target=upload, args=(c,)) for c in range(CLIENTS)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    rows = CLIENTS * FILES_PER_UPLOAD
+    print(f"{label:<12} {rows} rows in {elapsed:.3f}s ({rows / elapsed:.0f} rows/s)")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, upload in (("per-row", upload_per_row), ("grouped", upload_grouped)):
+            db_utils.DB_PATH = os.path.join(tmp, f"{label}.db")
+            db_utils.init_uploaded_db()
+            run(label, upload)
+        db_utils.stop_metadata_writer()
+
+
+if __name__ == "__main__":
+    main()
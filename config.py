@@ -19,3 +19,33 @@ SMTP_USER = "navin82005@gmail.com"
 SMTP_PASS = "eawx tuez baim velh"
 
 UPLOAD_FOLDER = "/media/uploads"
+
+# Upload metadata writer (group commit)
+UPLOAD_WRITE_BATCH_SIZE = 64
+UPLOAD_WRITE_INTERVAL_MS = 5
+UPLOAD_DURABLE_ACK = True
+UPLOAD_DURABLE_ACK_TIMEOUT = 10
+
+# Indexing error log rotation and sampling
+INDEX_LOG_MAX_BYTES = 5 * 1024 * 1024
+INDEX_LOG_BACKUPS = 3
+INDEX_ERROR_SAMPLES = 5
+INDEX_ERROR_MAX_KEYS = 1000
+INDEX_ERROR_LOG_RATE = 100
+
+# Pre-forked serving (launcher.py)
+SERVER_WORKERS = 4
+INDEX_POLL_INTERVAL = 1.0
+
+# Rate limiting for /download and /upload (0 = unlimited)
+# Byte rates are per server process; divide by SERVER_WORKERS when pre-forking
+RATE_LIMIT_REQUESTS_PER_SEC = 5
+RATE_LIMIT_BURST = 10
+BANDWIDTH_PER_CONNECTION = 10 * 1024 * 1024
+BANDWIDTH_GLOBAL = 50 * 1024 * 1024
+# Transfers this large queue for one of BULK_MAX_CONCURRENT slots
+BULK_TRANSFER_THRESHOLD = 1024 * 1024
+BULK_MAX_CONCURRENT = 4
+
+# Index snapshot loaded at startup when the local index is empty
+INDEX_SNAPSHOT_PATH = "index.snapshot.gz"
@@ -0,0 +1,135 @@
+"""Pre-forking production launcher.
+
+Runs the indexer once in its own process and serves the Flask app from N
+worker processes that share one listening socket and the SQLite (WAL)
+index. Workers become ready when the indexer publishes a new generation.
+
+Usage: python launcher.py [--workers N] [--host HOST] [--port PORT]
+"""
+import argparse
+import datetime
+import os
+import signal
+import socket
+import sys
+import time
+
+from config import SERVER_WORKERS
+
+# Worker restart policy: exits sooner than this after start count as failures
+WORKER_MIN_UPTIME = 5.0
+MAX_FAST_FAILURES = 10
+
+
+def run_indexer():
+    from tools.indexing import build_file_index, has_complete_index, wait_for_notifications
+    from tools.snapshot import load_snapshot_if_cold
+
+    start_time = datetime.datetime.now()
+    try:
+        # An existing or imported index is already being served; just reconcile it
+        build_file_index(incremental=has_complete_index() or load_snapshot_if_cold())
+    finally:
+        wait_for_notifications(timeout=60)
+    print(datetime.datetime.now() - start_time, "took to index files")
+
+
+def run_worker(sock, host, port, start_generation):
+    from werkzeug.serving import make_server
+
+    import server
+    from utils.db_utils import start_metadata_writer
+
+    start_metadata_writer()
+    server.watch_index_generation(start_generation)
+    httpd = make_server(host, port, server.app, threaded=True, fd=sock.fileno())
+    print(f"[{os.getpid()}] worker serving on {host}:{port}")
+    httpd.serve_forever()
+
+
+def spawn(target, *args):
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        code = 0
+        try:
+            target(*args)
+        except KeyboardInterrupt:
+            pass
+        except Exception:
+            import traceback
+            traceback.print_exc()
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+
+    from tools.indexing import get_index_generation, has_complete_index, init_db
+    from utils.db_utils import init_uploaded_db
+
+    # Schema and WAL mode are set up once, before any process touches the DB
+    init_db()
+    init_uploaded_db()
+    # Workers serve a complete existing index at once, otherwise wait for the indexer
+    start_generation = 0 if has_complete_index() else get_index_generation()
+
+    sock = socket.create_server((args.host, args.port), backlog=1024)
+
+    def start_worker():
+        pid = spawn(run_worker, sock, args.host, args.port, start_generation)
+        workers[pid] = time.monotonic()
+
+    indexer_pid = spawn(run_indexer)
+    workers = {}
+    for _ in range(args.workers):
+        start_worker()
+
+    def stop_children():
+        for pid in set(workers) | ({indexer_pid} if indexer_pid else set()):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def shutdown(signum, frame):
+        stop_children()
+        sys.exit(0)
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    # Supervise: replace workers that die, let the indexer exit once done
+    fast_failures = 0
+    while True:
+        pid, status = os.wait()
+        if pid == indexer_pid:
+            indexer_pid = None
+            if os.waitstatus_to_exitcode(status) != 0:
+                print("Indexer process failed, see INDEX_LOG_FILE")
+        elif pid in workers:
+            uptime = time.monotonic() - workers.pop(pid)
+            if uptime >= WORKER_MIN_UPTIME:
+                fast_failures = 0
+            else:
+                fast_failures += 1
+                if fast_failures >= MAX_FAST_FAILURES:
+                    print(f"Workers keep exiting within {WORKER_MIN_UPTIME:.0f}s of starting, giving up")
+                    stop_children()
+                    sys.exit(1)
+            delay = min(0.5 * 2 ** fast_failures, 30) if fast_failures else 0
+            print(f"Worker {pid} exited, restarting" + (f" in {delay:.1f}s" if delay else ""))
+            time.sleep(delay)
+            start_worker()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,40 +1,64 @@
 import datetime
 import threading
-from flask import Flask, request, send_file, jsonify
+import time
+from flask import Flask, g, request, send_file, jsonify
 from flask_cors import CORS
 import os
 import sqlite3
 
 
-from config import DB_PATH, DRIVE_PATH, MAX_RESULTS, UPLOAD_FOLDER
-from tools.indexing import build_file_index
+from config import (
+    BULK_TRANSFER_THRESHOLD, DB_PATH, DRIVE_PATH, INDEX_POLL_INTERVAL, MAX_RESULTS,
+    UPLOAD_DURABLE_ACK, UPLOAD_DURABLE_ACK_TIMEOUT, UPLOAD_FOLDER,
+)
 
 
 import uuid
+from urllib.parse import quote
 from werkzeug.utils import secure_filename
 
-from utils.db_utils import init_uploaded_db, insert_uploaded_file
+from utils import rate_limit
+from utils.db_utils import init_uploaded_db, insert_uploaded_file, start_metadata_writer
 
 
 app = Flask(__name__)
 CORS(app)
 
 
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-
+# Endpoints treated as bulk transfers by the rate limiter
+BULK_ENDPOINTS = {"download_file_using_path", "download_file", "upload_file"}
 
 # Global flags and thread
 indexing_done = False
 indexing_thread = None
+index_generation = 0
+watcher_thread = None
+warmup_done = False
+warmup_thread = None
+upload_folder_ready = False
+started_at = time.time()
 
 
 def index_worker():
-    global indexing_done
+    global indexing_done, index_generation
     """Background thread to build index"""
+    # Imported here so the app module stays cheap to import
+    from tools.indexing import build_file_index, get_index_generation, has_complete_index
+    from tools.snapshot import load_snapshot_if_cold
+
     start_time = datetime.datetime.now()
-    build_file_index()
+    if has_complete_index() or load_snapshot_if_cold():
+        # Serve the existing index right away and reconcile it with the drive
+        index_generation = get_index_generation()
+        indexing_done = True
+        start_warmup()
+        build_file_index(incremental=True)
+    else:
+        build_file_index()
+        start_warmup()
     complete_time = datetime.datetime.now()
     print(complete_time - start_time, "took to index files")
+    index_generation = get_index_generation()
     indexing_done = True
 
 
@@ -48,9 +72,78 @@ def start_indexing():
 
 
 
+def generation_watcher(start_generation):
+    """Background thread: pick up index generations published by the indexer process"""
+    global indexing_done, index_generation
+    from tools.indexing import get_index_generation
+
+    while True:
+        try:
+            generation = get_index_generation()
+        except Exception:
+            generation = index_generation
+        if generation != index_generation:
+            index_generation = generation
+            if generation > start_generation:
+                print(f"[{os.getpid()}] index generation {generation} ready")
+                indexing_done = True
+                start_warmup()
+        time.sleep(INDEX_POLL_INTERVAL)
+
+
+def watch_index_generation(start_generation):
+    """Used by pre-forked workers instead of start_indexing"""
+    global watcher_thread
+    if watcher_thread is None or not watcher_thread.is_alive():
+        watcher_thread = threading.Thread(target=generation_watcher, args=(start_generation,), daemon=True)
+        watcher_thread.start()
+
+
+
+def open_index():
+    """Read-only connection to the index for request handlers"""
+    return sqlite3.connect(f"file:{quote(os.path.abspath(DB_PATH))}?mode=ro", uri=True)
+
+
+def warm_index():
+    """Background thread: pull the index into the OS page cache before traffic needs it"""
+    global warmup_done
+    for path in (DB_PATH, DB_PATH + "-wal"):
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            continue
+        try:
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            else:
+                while os.read(fd, 1 << 20):
+                    pass
+        finally:
+            os.close(fd)
+
+    try:
+        conn = open_index()
+        # Walk the table and the name index once
+        conn.execute("SELECT COUNT(*) FROM files").fetchone()
+        conn.execute("SELECT COUNT(*) FROM files WHERE name LIKE ?", ("%.%",)).fetchone()
+        conn.close()
+    except sqlite3.Error as e:
+        print("Index warm-up query failed:", e)
+    warmup_done = True
+
+
+def start_warmup():
+    """Start warm-up thread only if not running or already done"""
+    global warmup_thread
+    if warmup_thread is None or not (warmup_thread.is_alive() or warmup_done):
+        warmup_thread = threading.Thread(target=warm_index, daemon=True)
+        warmup_thread.start()
+
+
 def find_files_in_drive(query):
     """Search for files in the SQLite index by partial filename match"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = open_index()
     cur = conn.cursor()
     # Use LIKE for partial matching instead of exact match
     cur.execute("SELECT name, path FROM files WHERE name LIKE ? ORDER BY name", (f"%{query.lower()}%",))
@@ -72,7 +165,7 @@ def get_file_stats(path):
 @app.route('/files')
 def list_files():
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = open_index()
         cur = conn.cursor()
         cur.execute("SELECT name, path FROM files LIMIT 100")  # Limit for performance
         rows = cur.fetchall()
@@ -104,95 +197,112 @@ def search_files():
             return jsonify({"error": "Query must be at least 2 characters"}), 400
 
         like_pattern = f"%{query.lower()}%"
-        conn = sqlite3.connect(DB_PATH)
+        conn = open_index()
         cur = conn.cursor()
 
-        # Search indexed files
-        cur.execute("""
-            SELECT name, path FROM files 
-            WHERE LOWER(name) LIKE ? 
-            LIMIT ?
-        """, (like_pattern, MAX_RESULTS))
-        indexed_matches = cur.fetchall()
-
-        # Search uploaded files
+        # One query over indexed and uploaded files (see the catalog view)
         cur.execute("""
-            SELECT original_name, path FROM uploaded_files 
-            WHERE LOWER(original_name) LIKE ? 
+            SELECT name, display_name, path, source FROM catalog
+            WHERE name LIKE ?
             LIMIT ?
         """, (like_pattern, MAX_RESULTS))
-        uploaded_matches = cur.fetchall()
+        matches = cur.fetchall()
         conn.close()
 
-        # Combine matches with source label
-        results_map = {}
-
-        for name, path in indexed_matches:
-            key = name.lower()
-            results_map.setdefault(key, []).append({
-                "name": name,
-                "path": os.path.relpath(path, DRIVE_PATH),
-                "full_path": path,
-                "source": "indexed"
-            })
-
-        for name, path in uploaded_matches:
-            key = name.lower()
-            results_map.setdefault(key, []).append({
-                "name": name,
-                "path": os.path.relpath(path, UPLOAD_FOLDER),
-                "full_path": path,
-                "source": "uploaded"
-            })
-
-        # Flatten results & handle multiple matches for same name
         results = []
-        choices = None
-        for key, file_entries in results_map.items():
-            if len(file_entries) == 1:
-                entry = file_entries[0]
-                stats = get_file_stats(entry["full_path"])
-                results.append({
-                    "name": entry["name"],
-                    "size": stats["size"],
-                    "path": entry["path"],
-                    "modified": stats["modified"],
-                    "source": entry["source"]
-                })
-            else:
-                # Multiple matches for same name: collect paths for 300 Multiple Choices
-                if not choices:
-                    choices = []
-                choices.extend([entry["path"] for entry in file_entries])
+        results_map = {}
+        for name, display_name, path, source in matches:
+            stats = get_file_stats(path)
+            base = UPLOAD_FOLDER if source == "uploaded" else DRIVE_PATH
+            entry = {
+                "name": display_name,
+                "size": stats["size"],
+                "path": os.path.relpath(path, base),
+                "modified": stats["modified"],
+                "source": source
+            }
+            results.append(entry)
+            results_map.setdefault(name, []).append(entry)
+
+        # Files sharing a name are grouped so clients can tell them apart
+        groups = [
+            {
+                "name": entries[0]["name"],
+                "count": len(entries),
+                "paths": [entry["path"] for entry in entries]
+            }
+            for entries in results_map.values() if len(entries) > 1
+        ]
 
-        response = {
+        return jsonify({
             "query": query,
             "count": len(results),
             "results": results,
-        }
-        if choices:
-            # Return 300 Multiple Choices response with list of paths
-            return jsonify({"choices": list(set(choices))}), 300
-
-        return jsonify(response)
+            "groups": groups,
+        })
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+@app.before_request
+def limit_bulk_requests():
+    """Per-client request rate limit and upload shaping for bulk endpoints"""
+    if request.endpoint not in BULK_ENDPOINTS:
+        return None
+
+    wait = rate_limit.check_client_rate(request.remote_addr)
+    if wait:
+        response = jsonify({"error": "Too many requests, slow down."})
+        response.headers["Retry-After"] = str(max(1, int(wait + 0.5)))
+        return response, 429
+
+    if request.endpoint == "upload_file":
+        # Every upload is charged to the byte rates; only large ones queue for a slot
+        if (request.content_length or 0) >= BULK_TRANSFER_THRESHOLD:
+            rate_limit.acquire_bulk_slot()
+            g.holds_bulk_slot = True
+        request.environ["wsgi.input"] = rate_limit.ThrottledReader(request.environ["wsgi.input"])
+    return None
+
+
+@app.teardown_request
+def release_upload_slot(exc):
+    if g.pop("holds_bulk_slot", False):
+        rate_limit.release_bulk_slot()
+
+
 @app.before_request
 def check_index_ready():
     """Block requests until index is ready"""
     global indexing_done
-    if not indexing_done and request.endpoint not in ['upload_file', None]:
+    if not indexing_done and request.endpoint not in ['upload_file', 'liveness', 'readiness', None]:
         return jsonify({"status": "Indexing in progress. Please try again later."}), 503
 
 
+@app.route('/health/live')
+def liveness():
+    """Process is up and answering requests"""
+    return jsonify({"status": "alive", "uptime": time.time() - started_at})
+
+
+@app.route('/health/ready')
+def readiness():
+    """Index is loaded and warmed; safe to route search traffic here"""
+    ready = indexing_done and warmup_done
+    return jsonify({
+        "ready": ready,
+        "index_loaded": indexing_done,
+        "index_warmed": warmup_done,
+        "index_generation": index_generation,
+    }), 200 if ready else 503
+
+
 @app.route('/status')
 def get_status():
     """Get server status"""
     global indexing_done
-    conn = sqlite3.connect(DB_PATH)
+    conn = open_index()
     cur = conn.cursor()
     cur.execute("SELECT COUNT(*) FROM files")
     total_files = cur.fetchone()[0]
@@ -200,11 +310,29 @@ def get_status():
     
     return jsonify({
         "indexing_complete": indexing_done,
+        "index_generation": index_generation,
         "total_files": total_files,
-        "upload_folder": UPLOAD_FOLDER
+        "upload_folder": UPLOAD_FOLDER,
+        "transfers": rate_limit.snapshot()
     })
 
 
+def send_shaped_file(file_path):
+    """send_file, rate shaped, with large downloads queued for a bulk slot"""
+    response = send_file(
+        file_path,
+        as_attachment=True,
+        download_name=os.path.basename(file_path)
+    )
+    # Small downloads skip the slot queue but still count against the byte rates
+    on_close = None
+    if (response.content_length or 0) >= BULK_TRANSFER_THRESHOLD:
+        rate_limit.acquire_bulk_slot()
+        on_close = rate_limit.release_bulk_slot
+    response.response = rate_limit.ThrottledIterator(response.response, on_close=on_close)
+    return response
+
+
 @app.route('/download')
 def download_file_using_path():
     """Serve file for download using query param ?filepath="""
@@ -230,11 +358,7 @@ def download_file_using_path():
             }), 300
 
         file_path = matches[0][1]  # Get path from tuple
-        return send_file(
-            file_path,
-            as_attachment=True,
-            download_name=os.path.basename(file_path)
-        )
+        return send_shaped_file(file_path)
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -256,15 +380,18 @@ def download_file(filename):
             }), 300
 
         file_path = matches[0][1]  # Get path from tuple
-        return send_file(
-            file_path,
-            as_attachment=True,
-            download_name=os.path.basename(file_path)
-        )
+        return send_shaped_file(file_path)
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def ensure_upload_folder():
+    global upload_folder_ready
+    if not upload_folder_ready:
+        os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+        upload_folder_ready = True
+
+
 @app.route("/upload", methods=["POST"])
 def upload_file():
     """Enhanced file upload with better validation and response"""
@@ -279,6 +406,7 @@ def upload_file():
             return jsonify({"error": "No files selected"}), 400
 
         uploaded_files = []
+        pending_writes = []
         errors = []
 
         for f in files:
@@ -299,21 +427,44 @@ def upload_file():
                     unique_filename = f"{name}_{uuid.uuid4().hex[:8]}{ext}"
                     
                     filepath = os.path.join(UPLOAD_FOLDER, unique_filename)
+                    ensure_upload_folder()
                     f.save(filepath)
                     
-                    # Insert record into uploaded_files table
-                    insert_uploaded_file(f.filename, unique_filename, file_size, filepath)
+                    # Queue record for the uploaded_files group commit
+                    pending = insert_uploaded_file(f.filename, unique_filename, file_size, filepath)
+                    pending_writes.append((f.filename, unique_filename, pending))
                     
                     uploaded_files.append({
                         "original_name": f.filename,
                         "saved_name": unique_filename,
                         "size": file_size,
-                        "path": filepath
+                        "path": filepath,
+                        "status": "pending"  # metadata queued, not yet committed
                     })
                     
                 except Exception as e:
                     errors.append(f"Error uploading '{f.filename}': {str(e)}")
 
+        if UPLOAD_DURABLE_ACK:
+            # Acknowledge only once every queued record has been committed
+            failed = set()
+            committed = set()
+            deadline = time.monotonic() + UPLOAD_DURABLE_ACK_TIMEOUT
+            for original_name, saved_name, pending in pending_writes:
+                try:
+                    pending.wait(max(0, deadline - time.monotonic()))
+                    committed.add(saved_name)
+                except TimeoutError:
+                    # Still queued and will be committed; the file is accepted, don't invite a retry
+                    errors.append(f"Metadata for '{original_name}' is still being saved")
+                except Exception as e:
+                    failed.add(saved_name)
+                    errors.append(f"Error saving metadata for '{original_name}': {str(e)}")
+            uploaded_files = [u for u in uploaded_files if u["saved_name"] not in failed]
+            for u in uploaded_files:
+                if u["saved_name"] in committed:
+                    u["status"] = "committed"
+
         if uploaded_files:
             response_data = {
                 "message": f"Successfully uploaded {len(uploaded_files)} file(s)",
@@ -334,7 +485,7 @@ def upload_file():
 
 @app.route("/uploaded-files", methods=["GET"])
 def list_uploaded_files():
-    conn = sqlite3.connect(DB_PATH)
+    conn = open_index()
     cur = conn.cursor()
     cur.execute("SELECT original_name, saved_name, size, path, upload_time FROM uploaded_files ORDER BY upload_time DESC")
     rows = cur.fetchall()
@@ -358,4 +509,5 @@ if __name__ == "__main__":
     if os.environ.get("WERKZEUG_RUN_MAIN") == "true" or not app.debug:
         start_indexing()
         init_uploaded_db()
+        start_metadata_writer()
     app.run(host="0.0.0.0", port=8080, debug=True, use_reloader=False)
\ No newline at end of file
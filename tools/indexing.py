@@ -1,46 +1,132 @@
+import logging
+from logging.handlers import MemoryHandler, RotatingFileHandler
 import os
 import sqlite3
+import threading
+import time
 import traceback
-import smtplib
-from email.mime.text import MIMEText
 
-from config import DB_PATH, DRIVE_PATH, INDEX_LOG_FILE, SKIP_FOLDERS
+from config import (
+    DB_PATH, DRIVE_PATH, INDEX_ERROR_LOG_RATE, INDEX_ERROR_MAX_KEYS, INDEX_ERROR_SAMPLES, INDEX_LOG_BACKUPS,
+    INDEX_LOG_FILE, INDEX_LOG_MAX_BYTES, SKIP_FOLDERS,
+)
 
 
-# Store errors during one indexing run
-_indexing_errors = []
+# Aggregated errors for one indexing run, keyed by (subject, error type, directory)
+_error_counts = {}
+_error_samples = {}
+_log_window = [0.0, 0]  # [window start, lines written in window]
+_error_logger = None
+_notify_thread = None
 
-def log_error(subject: str, message: str):
-    """Log error to file and memory (no email yet)"""
-    with open(INDEX_LOG_FILE, "a") as f:
-        f.write(subject + "\n" + message + "\n\n")
-    _indexing_errors.append(f"{subject}\n{message}")
 
+def _get_error_logger():
+    """Buffered, size-rotated writer for INDEX_LOG_FILE"""
+    global _error_logger
+    if _error_logger is None:
+        file_handler = RotatingFileHandler(
+            INDEX_LOG_FILE, maxBytes=INDEX_LOG_MAX_BYTES, backupCount=INDEX_LOG_BACKUPS, delay=True
+        )
+        file_handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        logger = logging.getLogger("ft_server.indexing")
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        logger.addHandler(MemoryHandler(capacity=256, flushLevel=logging.CRITICAL, target=file_handler))
+        _error_logger = logger
+    return _error_logger
 
-def send_error_summary():
-    """Send a single email with all errors if any"""
-    if not _indexing_errors:
-        return  # nothing to notify
 
-    summary = "\n\n".join(_indexing_errors)
-    subject = f"Indexing completed with {len(_indexing_errors)} errors"
+def _log_allowed() -> bool:
+    """Cap log lines per second so a bad drive cannot flood the disk"""
+    now = time.monotonic()
+    if now - _log_window[0] >= 1.0:
+        _log_window[0] = now
+        _log_window[1] = 0
+    _log_window[1] += 1
+    return _log_window[1] <= INDEX_ERROR_LOG_RATE
+
+
+def flush_error_log():
+    """Write out any buffered log records"""
+    for handler in _get_error_logger().handlers:
+        handler.flush()
+
+
+def reset_errors():
+    """Clear aggregated errors before a new indexing run"""
+    _error_counts.clear()
+    _error_samples.clear()
+
 
+def log_error(subject: str, message: str, directory: str = None, error: Exception = None):
+    """Count error per type/directory, keep a few samples and log at a bounded rate"""
+    key = (subject, type(error).__name__ if error else "", directory or "")
+    if key not in _error_counts and len(_error_counts) >= INDEX_ERROR_MAX_KEYS:
+        key = (subject, key[1], "<other directories>")
+    count = _error_counts.get(key, 0) + 1
+    _error_counts[key] = count
+
+    if count <= INDEX_ERROR_SAMPLES:
+        _error_samples.setdefault(key, []).append(message)
+
+    if count <= INDEX_ERROR_SAMPLES and _log_allowed():
+        _get_error_logger().error("%s\n%s\n", subject, message)
+
+
+def _format_error_summary() -> str:
+    lines = []
+    for key, count in sorted(_error_counts.items(), key=lambda kv: kv[1], reverse=True):
+        subject, error_type, directory = key
+        header = subject
+        if error_type:
+            header += f" [{error_type}]"
+        if directory:
+            header += f" in {directory}"
+        lines.append(f"{header}: {count} occurrence(s)")
+        lines.extend("    " + sample for sample in _error_samples.get(key, []))
+    return "\n".join(lines)
+
+
+def _send_email(subject: str, body: str):
     try:
+        import smtplib
+        from email.mime.text import MIMEText
         from config import ADMIN_EMAIL, SMTP_SERVER, SMTP_PORT, SMTP_USER, SMTP_PASS
-        msg = MIMEText(summary)
+        msg = MIMEText(body)
         msg["Subject"] = subject
         msg["From"] = SMTP_USER
         msg["To"] = ADMIN_EMAIL
 
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
+        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=30) as server:
             server.starttls()
             server.login(SMTP_USER, SMTP_PASS)
             server.send_message(msg)
     except ImportError:
         pass  # email settings not configured
     except Exception as e:
-        with open(INDEX_LOG_FILE, "a") as f:
-            f.write("Email notification failed: " + str(e) + "\n")
+        _get_error_logger().critical("Email notification failed: %s", e)
+
+
+def send_error_summary():
+    """Send a single aggregated email off the indexing thread, if any errors"""
+    global _notify_thread
+    flush_error_log()
+    if not _error_counts:
+        return  # nothing to notify
+
+    total = sum(_error_counts.values())
+    subject = f"Indexing completed with {total} errors"
+    summary = _format_error_summary()
+    _get_error_logger().critical("%s\n%s\n", subject, summary)
+
+    _notify_thread = threading.Thread(target=_send_email, args=(subject, summary), daemon=True)
+    _notify_thread.start()
+
+
+def wait_for_notifications(timeout: float = None):
+    """Let a short-lived indexer process finish sending its summary"""
+    if _notify_thread is not None:
+        _notify_thread.join(timeout)
 
 
 def normalize_path(path: str) -> str:
@@ -48,6 +134,64 @@ def normalize_path(path: str) -> str:
     return os.path.realpath(os.path.abspath(os.path.expanduser(path)))
 
 
+def walk_drive(top: str, onerror=None):
+    """Yield (directory, resolved directory, file DirEntries) under top.
+
+    Directories are de-duplicated by (st_dev, st_ino) so bind mounts and
+    other aliases of the same directory are scanned once. Like os.walk,
+    symlinked directories are not descended into. Memory grows with the
+    number of directories, not files.
+
+    Only top is passed through realpath: every directory below it is
+    reached through non-symlink entries, so its resolved path is the
+    parent's resolved path joined with its name.
+    """
+    try:
+        st = os.stat(top)
+    except OSError as e:
+        if onerror is not None:
+            onerror(e)
+        return
+    seen_dirs = {(st.st_dev, st.st_ino)}
+    stack = [(top, normalize_path(top))]
+
+    while stack:
+        root, resolved_root = stack.pop()
+        try:
+            with os.scandir(root) as it:
+                entries = list(it)
+        except OSError as e:
+            if onerror is not None:
+                onerror(e)
+            continue
+
+        files = []
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+
+            if not is_dir:
+                files.append(entry)
+                continue
+            if entry.name in SKIP_FOLDERS or entry.is_symlink():
+                continue
+
+            try:
+                st = entry.stat(follow_symlinks=False)
+            except OSError as e:
+                if onerror is not None:
+                    onerror(e)
+                continue
+            key = (st.st_dev, st.st_ino)
+            if key not in seen_dirs:
+                seen_dirs.add(key)
+                stack.append((entry.path, os.path.join(resolved_root, entry.name)))
+
+        yield root, resolved_root, files
+
+
 def init_db():
     conn = sqlite3.connect(DB_PATH)
     cur = conn.cursor()
@@ -59,65 +203,157 @@ def init_db():
         )
     """)
     cur.execute("CREATE INDEX IF NOT EXISTS idx_name ON files(name)")
+    try:
+        cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_path ON files(path)")
+    except sqlite3.IntegrityError:
+        # Index built before paths were unique: drop duplicates first
+        cur.execute("DELETE FROM files WHERE id NOT IN (SELECT MIN(id) FROM files GROUP BY path)")
+        cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_path ON files(path)")
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS index_meta (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            generation INTEGER NOT NULL,
+            completed_at TIMESTAMP
+        )
+    """)
+    cur.execute("INSERT OR IGNORE INTO index_meta (id, generation) VALUES (1, 0)")
     conn.commit()
+    # WAL lets worker processes keep reading while the indexer writes
+    cur.execute("PRAGMA journal_mode=WAL").fetchone()
     conn.close()
 
 
+def get_index_generation() -> int:
+    """Return the number of completed index builds, 0 if none yet"""
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        row = conn.execute("SELECT generation FROM index_meta WHERE id = 1").fetchone()
+    except sqlite3.OperationalError:
+        row = None  # index not initialised yet
+    finally:
+        conn.close()
+    return row[0] if row else 0
+
+
+def bump_index_generation(conn):
+    """Publish a completed index build to readers polling get_index_generation"""
+    conn.execute("UPDATE index_meta SET generation = generation + 1, completed_at = CURRENT_TIMESTAMP WHERE id = 1")
+    conn.commit()
+
+
+def has_complete_index() -> bool:
+    """True if the last full build finished, so the index can be served as is"""
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        row = conn.execute("SELECT generation, completed_at FROM index_meta WHERE id = 1").fetchone()
+    except sqlite3.OperationalError:
+        row = None  # index not initialised yet
+    finally:
+        conn.close()
+    return bool(row and row[0] > 0 and row[1] is not None)
+
+
 def clear_index():
     conn = sqlite3.connect(DB_PATH)
     conn.execute("DELETE FROM files")
+    # A partial table must not be served as complete if this build dies
+    conn.execute("UPDATE index_meta SET completed_at = NULL WHERE id = 1")
     conn.commit()
     conn.close()
 
 
-def build_file_index():
-    """Scan drive once and store files in SQLite"""
+def build_file_index(incremental: bool = False):
+    """Scan drive once and store files in SQLite.
+
+    With incremental=True the existing rows keep serving searches while
+    the scan runs; the result is merged in at the end (new paths added,
+    vanished paths removed) instead of clearing the table up front.
+    Rows under directories that could not be listed are kept, and the
+    merge is skipped entirely if the drive root itself is unreadable.
+    """
     try:
-        # reset error buffer for this run
-        global _indexing_errors
-        _indexing_errors = []
+        # reset error counters for this run
+        reset_errors()
 
         init_db()
-        clear_index()
+        if not incremental:
+            clear_index()
 
-        print("Indexing drive...")
+        print("Reconciling index..." if incremental else "Indexing drive...")
         print("Drive to be indexed:", DRIVE_PATH)
         print("Folders to be skipped:", SKIP_FOLDERS)
 
         conn = sqlite3.connect(DB_PATH)
         cur = conn.cursor()
 
+        table = "files"
+        if incremental:
+            table = "files_scan"
+            cur.execute("CREATE TEMP TABLE files_scan (name TEXT NOT NULL, path TEXT PRIMARY KEY) WITHOUT ROWID")
+
         batch = []
-        seen_paths = set()
+        top = os.path.abspath(DRIVE_PATH)
+        unlisted = set()  # directories whose contents are unknown this run
 
-        for root, dirs, files in os.walk(os.path.abspath(DRIVE_PATH), topdown=True):
-            dirs[:] = [d for d in dirs if d not in SKIP_FOLDERS]
+        def on_walk_error(e):
+            log_error("Indexing error", f"Cannot list {e.filename}: {e}", os.path.dirname(e.filename or ""), e)
+            if e.filename:
+                unlisted.add(os.fsdecode(e.filename))
 
-            for file in files:
+        for root, resolved_root, entries in walk_drive(top, on_walk_error):
+            for entry in entries:
+                file = entry.name
                 try:
-                    full_path = normalize_path(os.path.join(root, file))
+                    # Only symlinks need resolving; everything else sits in resolved_root
+                    if entry.is_symlink():
+                        full_path = normalize_path(entry.path)
+                    else:
+                        full_path = os.path.join(resolved_root, file)
                 except PermissionError as e:
-                    log_error("Indexing error", f"Permission denied on {file}: {e}")
+                    log_error("Indexing error", f"Permission denied on {file}: {e}", root, e)
                     continue
                 except Exception as e:
-                    log_error("Indexing error", f"Error on file {file}: {e}")
-                    continue
-
-                if full_path in seen_paths:
+                    log_error("Indexing error", f"Error on file {file}: {e}", root, e)
                     continue
-                seen_paths.add(full_path)
 
+                # Duplicate paths (e.g. file symlinks) are dropped by the UNIQUE index
                 batch.append((file.lower(), full_path))
 
                 if len(batch) >= 500:
-                    cur.executemany("INSERT INTO files (name, path) VALUES (?, ?)", batch)
+                    cur.executemany(f"INSERT OR IGNORE INTO {table} (name, path) VALUES (?, ?)", batch)
                     conn.commit()
                     batch.clear()
 
         if batch:
-            cur.executemany("INSERT INTO files (name, path) VALUES (?, ?)", batch)
+            cur.executemany(f"INSERT OR IGNORE INTO {table} (name, path) VALUES (?, ?)", batch)
+            conn.commit()
+
+        if incremental:
+            if top in unlisted:
+                # Unmounted or unreadable drive: an empty scan must not wipe the index
+                print("Cannot list drive root, keeping the existing index")
+                cur.execute("DROP TABLE files_scan")
+                conn.close()
+                return
+
+            # Rows under directories that could not be listed are kept as they are
+            cur.execute("CREATE TEMP TABLE files_unlisted (dir TEXT PRIMARY KEY) WITHOUT ROWID")
+            cur.executemany("INSERT OR IGNORE INTO files_unlisted (dir) VALUES (?)",
+                            ((normalize_path(d),) for d in unlisted))
+            cur.execute("""
+                DELETE FROM files
+                WHERE path NOT IN (SELECT path FROM files_scan)
+                AND NOT EXISTS (
+                    SELECT 1 FROM files_unlisted u
+                    WHERE substr(files.path, 1, length(u.dir) + 1) = u.dir || '/'
+                )
+            """)
+            cur.execute("INSERT OR IGNORE INTO files (name, path) SELECT name, path FROM files_scan")
+            cur.execute("DROP TABLE files_scan")
+            cur.execute("DROP TABLE files_unlisted")
             conn.commit()
 
+        bump_index_generation(conn)
         conn.close()
 
     except Exception:
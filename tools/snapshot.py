@@ -0,0 +1,164 @@
+"""Export/import of the file index as a compressed, versioned snapshot.
+
+A snapshot lets a new node for the same drive serve searches right away
+and reconcile with an incremental scan in the background, instead of
+waiting for a full build_file_index walk.
+
+Layout (gzip stream): one JSON manifest line, then NUL-separated fields
+sorted by path. A field starting with "/" opens a directory (relative to
+the drive root); it is followed by file basename / indexed name pairs
+for that directory. The name is empty when it is just the lowercased
+basename, and file names can never contain "/", so this is unambiguous.
+
+Usage: python -m tools.snapshot export|import [path]
+"""
+import datetime
+import gzip
+import json
+import os
+import sqlite3
+import sys
+import zlib
+
+from config import DB_PATH, DRIVE_PATH, INDEX_SNAPSHOT_PATH, SKIP_FOLDERS
+from tools.indexing import bump_index_generation, get_index_generation, init_db, normalize_path
+
+SNAPSHOT_FORMAT = "ft-index-snapshot"
+SNAPSHOT_VERSION = 1
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def export_snapshot(dest: str = INDEX_SNAPSHOT_PATH) -> dict:
+    """Write the current files table to dest and return its manifest"""
+    root = normalize_path(DRIVE_PATH)
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        file_count = conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+        manifest = {
+            "format": SNAPSHOT_FORMAT,
+            "version": SNAPSHOT_VERSION,
+            "generation": get_index_generation(),
+            "roots": [root],
+            "skip_folders": sorted(SKIP_FOLDERS),
+            "file_count": file_count,
+            "created_at": datetime.datetime.now().isoformat(),
+        }
+
+        tmp_path = dest + ".tmp"
+        with gzip.open(tmp_path, "wb", compresslevel=6) as out:
+            out.write(json.dumps(manifest).encode() + b"\n")
+            current_dir = None
+            for name, path in conn.execute("SELECT name, path FROM files ORDER BY path"):
+                directory, base = os.path.split(path)
+                if directory != current_dir:
+                    current_dir = directory
+                    out.write(f"/{os.path.relpath(directory, root)}\0".encode("utf-8", "surrogateescape"))
+                if name == base.lower():
+                    name = ""
+                out.write(f"{base}\0{name}\0".encode("utf-8", "surrogateescape"))
+        os.replace(tmp_path, dest)
+    finally:
+        conn.close()
+    return manifest
+
+
+def read_manifest(src: str = INDEX_SNAPSHOT_PATH) -> dict:
+    with gzip.open(src, "rb") as f:
+        manifest = json.loads(f.readline())
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        raise SnapshotError(f"{src} is not an index snapshot")
+    if manifest.get("version") != SNAPSHOT_VERSION:
+        raise SnapshotError(f"Unsupported snapshot version {manifest.get('version')}")
+    return manifest
+
+
+def _records(f, root):
+    """Yield (name, full path) rows from the record section"""
+    prefix = root
+    base = None
+    pending = b""
+    while True:
+        chunk = f.read(1 << 20)
+        if not chunk:
+            break
+        fields = (pending + chunk).split(b"\0")
+        pending = fields.pop()
+        for field in fields:
+            field = field.decode("utf-8", "surrogateescape")
+            if base is not None:
+                yield (field or base.lower(), prefix + base)
+                base = None
+            elif field.startswith("/"):
+                prefix = os.path.normpath(os.path.join(root, field[1:])).rstrip("/") + "/"
+            else:
+                base = field
+
+
+def import_snapshot(src: str = INDEX_SNAPSHOT_PATH) -> dict:
+    """Replace the files table with the snapshot, rebased onto DRIVE_PATH"""
+    manifest = read_manifest(src)
+    root = normalize_path(DRIVE_PATH)
+
+    init_db()
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        cur = conn.cursor()
+        cur.execute("DELETE FROM files")
+        # Records arrive sorted by path; building the name index once at the end is cheaper
+        cur.execute("DROP INDEX IF EXISTS idx_name")
+        with gzip.open(src, "rb") as f:
+            f.readline()  # manifest
+            batch = []
+            for row in _records(f, root):
+                batch.append(row)
+                if len(batch) >= 5000:
+                    cur.executemany("INSERT OR IGNORE INTO files (name, path) VALUES (?, ?)", batch)
+                    batch.clear()
+            if batch:
+                cur.executemany("INSERT OR IGNORE INTO files (name, path) VALUES (?, ?)", batch)
+        # A truncated stream can end cleanly on a field boundary; closing
+        # without commit rolls back to the previous files table
+        imported = cur.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+        if imported != manifest.get("file_count"):
+            raise SnapshotError(f"Snapshot has {imported} files, manifest says {manifest.get('file_count')}")
+        cur.execute("CREATE INDEX idx_name ON files(name)")
+        conn.commit()
+        bump_index_generation(conn)
+    finally:
+        conn.close()
+    return manifest
+
+
+def load_snapshot_if_cold(src: str = INDEX_SNAPSHOT_PATH) -> bool:
+    """Import src when the local index is empty; True if the index was loaded"""
+    if not src or not os.path.exists(src):
+        return False
+
+    init_db()
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        has_rows = conn.execute("SELECT 1 FROM files LIMIT 1").fetchone() is not None
+    finally:
+        conn.close()
+    if has_rows:
+        return False
+
+    try:
+        manifest = import_snapshot(src)
+    except (OSError, ValueError, EOFError, zlib.error, SnapshotError) as e:
+        print("Ignoring index snapshot:", e)
+        return False
+    print(f"Loaded index snapshot generation {manifest['generation']} ({manifest['file_count']} files)")
+    return True
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 3) or sys.argv[1] not in ("export", "import"):
+        print(__doc__.strip().splitlines()[-1])
+        sys.exit(2)
+    path = sys.argv[2] if len(sys.argv) == 3 else INDEX_SNAPSHOT_PATH
+    result = export_snapshot(path) if sys.argv[1] == "export" else import_snapshot(path)
+    print(json.dumps(result, indent=2))
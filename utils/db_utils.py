@@ -1,7 +1,12 @@
 from datetime import datetime
+import atexit
+import os
+import queue
 import sqlite3
+import threading
+import time
 
-from config import DB_PATH
+from config import DB_PATH, DRIVE_PATH, UPLOAD_WRITE_BATCH_SIZE, UPLOAD_WRITE_INTERVAL_MS
 
 def init_uploaded_db():
     conn = sqlite3.connect(DB_PATH)
@@ -17,18 +22,163 @@ def init_uploaded_db():
         )
     """)
     cur.execute("CREATE INDEX IF NOT EXISTS idx_uploaded_saved_name ON uploaded_files(saved_name)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_uploaded_path ON uploaded_files(path)")
+    # Single searchable catalog of indexed and uploaded files. Uploads inside
+    # the drive also appear in files; the uploaded row (original name) wins.
+    cur.execute("""
+        CREATE VIEW IF NOT EXISTS catalog AS
+        SELECT LOWER(original_name) AS name, original_name AS display_name, path, 'uploaded' AS source
+        FROM uploaded_files
+        UNION ALL
+        SELECT name, name AS display_name, path, 'indexed' AS source
+        FROM files
+        WHERE NOT EXISTS (SELECT 1 FROM uploaded_files u WHERE u.path = files.path)
+    """)
     conn.commit()
     conn.close()
 
 
 
-def insert_uploaded_file(original_name, saved_name, size, path):
-    conn = sqlite3.connect(DB_PATH)
+class PendingWrite:
+    """Acknowledgement handle for a queued uploaded_files insert"""
+
+    def __init__(self):
+        self._done = threading.Event()
+        self.error = None
+
+    def _resolve(self, error=None):
+        self.error = error
+        self._done.set()
+
+    def wait(self, timeout=None):
+        """Block until the row is committed; raise if the commit failed"""
+        if not self._done.wait(timeout):
+            raise TimeoutError("Upload metadata write not committed in time")
+        if self.error is not None:
+            raise self.error
+
+
+# Background group-commit writer for upload metadata
+_write_queue = queue.Queue()
+_writer_thread = None
+_writer_lock = threading.Lock()
+
+
+def _index_row_for(path):
+    """Row for the files table if the upload lives inside the indexed drive"""
+    full_path = os.path.realpath(os.path.abspath(path))
+    drive_root = os.path.realpath(os.path.abspath(DRIVE_PATH))
+    if os.path.commonpath([full_path, drive_root]) != drive_root:
+        return None
+    return (os.path.basename(full_path).lower(), full_path)
+
+
+def _files_table_exists(cur):
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'files'")
+    return cur.fetchone() is not None
+
+
+def _commit_batch(conn, batch):
+    """Insert a batch of queued uploads in a single transaction"""
     cur = conn.cursor()
-    cur.execute("""
-        INSERT INTO uploaded_files (original_name, saved_name, size, path, upload_time)
-        VALUES (?, ?, ?, ?, ?)
-    """, (original_name, saved_name, size, path, datetime.now()))
-    conn.commit()
+    try:
+        cur.executemany("""
+            INSERT INTO uploaded_files (original_name, saved_name, size, path, upload_time)
+            VALUES (?, ?, ?, ?, ?)
+        """, [row for row, _ in batch])
+
+        # Make the new files searchable without waiting for the next full scan
+        index_rows = [r for r in (_index_row_for(row[3]) for row, _ in batch) if r]
+        if index_rows and _files_table_exists(cur):
+            cur.executemany("INSERT OR IGNORE INTO files (name, path) VALUES (?, ?)", index_rows)
+
+        conn.commit()
+        error = None
+    except Exception as e:
+        conn.rollback()
+        error = e
+
+    for _, pending in batch:
+        pending._resolve(error)
+
+
+def _fail_queued(batch, error):
+    """Resolve the current batch and everything still queued with error"""
+    for _, pending in batch:
+        pending._resolve(error)
+    while True:
+        try:
+            item = _write_queue.get_nowait()
+        except queue.Empty:
+            break
+        if item is not None:
+            item[1]._resolve(error)
+
+
+def _writer_loop():
+    batch = []
+    try:
+        _write_batches(batch)
+    except Exception as e:
+        # Don't leave durable-ack callers waiting on a dead writer
+        _fail_queued(batch, e)
+
+
+def _write_batches(batch):
+    conn = sqlite3.connect(DB_PATH)
+    interval = UPLOAD_WRITE_INTERVAL_MS / 1000.0
+    while True:
+        item = _write_queue.get()
+        if item is None:
+            break
+
+        # Collect more rows until the batch is full or the window closes
+        batch.append(item)
+        stop = False
+        deadline = time.monotonic() + interval
+        while len(batch) < UPLOAD_WRITE_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            try:
+                item = _write_queue.get(timeout=remaining) if remaining > 0 else _write_queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                stop = True
+                break
+            batch.append(item)
+
+        _commit_batch(conn, batch)
+        batch.clear()
+        if stop:
+            break
     conn.close()
 
+
+def start_metadata_writer():
+    """Start the upload metadata writer thread only if not running"""
+    global _writer_thread
+    with _writer_lock:
+        if _writer_thread is None or not _writer_thread.is_alive():
+            _writer_thread = threading.Thread(target=_writer_loop, daemon=True)
+            _writer_thread.start()
+
+
+def stop_metadata_writer():
+    """Flush queued rows and stop the writer thread"""
+    global _writer_thread
+    with _writer_lock:
+        if _writer_thread is not None and _writer_thread.is_alive():
+            _write_queue.put(None)
+            _writer_thread.join()
+        _writer_thread = None
+
+
+atexit.register(stop_metadata_writer)
+
+
+def insert_uploaded_file(original_name, saved_name, size, path):
+    """Queue an uploaded file record; call .wait() on the result for a durable ack"""
+    start_metadata_writer()
+    pending = PendingWrite()
+    _write_queue.put(((original_name, saved_name, size, path, datetime.now()), pending))
+    return pending
@@ -0,0 +1,179 @@
+from collections import OrderedDict
+import io
+import threading
+import time
+
+from config import (
+    BANDWIDTH_GLOBAL, BANDWIDTH_PER_CONNECTION, BULK_MAX_CONCURRENT,
+    RATE_LIMIT_BURST, RATE_LIMIT_REQUESTS_PER_SEC,
+)
+
+
+class TokenBucket:
+    """Thread-safe token bucket; a rate of 0 means unlimited"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, amount=1):
+        """Take tokens if available; return seconds to wait otherwise (0 = granted)"""
+        if not self.rate:
+            return 0
+        with self.lock:
+            self._refill()
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return 0
+            return (amount - self.tokens) / self.rate
+
+    def consume(self, amount):
+        """Take tokens, going into debt, and sleep until the debt is repaid"""
+        if not self.rate:
+            return
+        with self.lock:
+            self._refill()
+            self.tokens -= amount
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+
+# Accounting shown on /status
+stats = {
+    "requests_limited": 0,
+    "bytes_sent": 0,
+    "bytes_received": 0,
+    "active_bulk_transfers": 0,
+    "queued_bulk_transfers": 0,
+}
+_stats_lock = threading.Lock()
+
+
+def _count(key, amount=1):
+    with _stats_lock:
+        stats[key] += amount
+
+
+_client_buckets = OrderedDict()
+_client_lock = threading.Lock()
+_MAX_TRACKED_CLIENTS = 10000
+
+global_bandwidth = TokenBucket(BANDWIDTH_GLOBAL)
+_bulk_slots = threading.BoundedSemaphore(BULK_MAX_CONCURRENT) if BULK_MAX_CONCURRENT else None
+
+
+def check_client_rate(client):
+    """Per-client request limit; return seconds to wait, 0 if allowed"""
+    if not RATE_LIMIT_REQUESTS_PER_SEC:
+        return 0
+    with _client_lock:
+        bucket = _client_buckets.pop(client, None)
+        if bucket is None:
+            bucket = TokenBucket(RATE_LIMIT_REQUESTS_PER_SEC, RATE_LIMIT_BURST)
+            if len(_client_buckets) >= _MAX_TRACKED_CLIENTS:
+                _client_buckets.popitem(last=False)
+        _client_buckets[client] = bucket
+    wait = bucket.try_acquire()
+    if wait:
+        _count("requests_limited")
+    return wait
+
+
+def acquire_bulk_slot():
+    """Wait for one of BULK_MAX_CONCURRENT bulk transfer slots"""
+    _count("queued_bulk_transfers")
+    if _bulk_slots is not None:
+        _bulk_slots.acquire()
+    _count("queued_bulk_transfers", -1)
+    _count("active_bulk_transfers")
+
+
+def release_bulk_slot():
+    _count("active_bulk_transfers", -1)
+    if _bulk_slots is not None:
+        _bulk_slots.release()
+
+
+def _shape(connection, amount):
+    connection.consume(amount)
+    global_bandwidth.consume(amount)
+
+
+class ThrottledIterator:
+    """Download body iterator that yields chunks at the shaped byte rates.
+
+    on_close runs exactly once when the server closes the body, even if
+    it was never iterated.
+    """
+
+    def __init__(self, chunks, on_close=None):
+        self._chunks = chunks
+        self._iter = iter(chunks)
+        self._connection = TokenBucket(BANDWIDTH_PER_CONNECTION)
+        self._on_close = on_close
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        chunk = next(self._iter)
+        _shape(self._connection, len(chunk))
+        _count("bytes_sent", len(chunk))
+        return chunk
+
+    def close(self):
+        close = getattr(self._chunks, "close", None)
+        if close is not None:
+            close()
+        on_close, self._on_close = self._on_close, None
+        if on_close is not None:
+            on_close()
+
+
+class ThrottledReader(io.RawIOBase):
+    """wsgi.input wrapper that reads an upload body at the shaped byte rates"""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._connection = TokenBucket(BANDWIDTH_PER_CONNECTION)
+
+    def readable(self):
+        return True
+
+    def _account(self, data):
+        if data:
+            _shape(self._connection, len(data))
+            _count("bytes_received", len(data))
+        return data
+
+    def read(self, size=-1):
+        return self._account(self._stream.read(size))
+
+    def readline(self, size=-1):
+        return self._account(self._stream.readline(size))
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def snapshot():
+    with _stats_lock:
+        data = dict(stats)
+    data["limits"] = {
+        "requests_per_sec_per_client": RATE_LIMIT_REQUESTS_PER_SEC,
+        "bytes_per_sec_per_connection": BANDWIDTH_PER_CONNECTION,
+        "bytes_per_sec_global": BANDWIDTH_GLOBAL,
+        "max_concurrent_bulk": BULK_MAX_CONCURRENT,
+    }
+    return data